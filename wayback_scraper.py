@@ -6,18 +6,54 @@ for two different dates specified in a CSV file.
 """
 
 import argparse
+import asyncio
+import atexit
+import contextlib
+import csv
+import functools
+import hashlib
+import http.client
+import importlib.util
 import os
+import re
+import signal
+import sqlite3
 import subprocess
 import sys
 import json
 import logging
+import logging.handlers
+import queue
+import threading
 import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from urllib.parse import urlparse
-import pandas as pd
+from urllib.parse import urlencode, urlparse
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
+# Optional compact binary state format
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Optional fast JSON encoder for the state file
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional progress bar
+try:
+    from tqdm import tqdm
+    from tqdm.contrib.logging import logging_redirect_tqdm
+except ImportError:
+    tqdm = None
+
 # CSV Column Constants - Modify these to match your CSV column names
 WEBSITE_URL_COLUMN = 'URL'
 DEAL_DATE_COLUMN = 'Deal Date'
@@ -29,16 +65,500 @@ MONTHS_AFTER_DEAL = 12
 # State file name
 STATE_FILE_NAME = 'wayback_scraper_state.json'
 
+# State files with these extensions are stored as MessagePack instead of JSON
+STATE_MSGPACK_SUFFIXES = ('.msgpack', '.mpk')
+
+# State files with these extensions are SQLite databases, updated with one upsert
+# per completed download instead of journal + snapshot rewrites
+STATE_SQLITE_SUFFIXES = ('.sqlite', '.sqlite3', '.db')
+STATE_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    url TEXT NOT NULL,
+    key TEXT NOT NULL,
+    completed INTEGER NOT NULL,
+    timestamp TEXT,
+    folder TEXT,
+    PRIMARY KEY (url, key)
+)
+"""
+
+# Completed downloads are appended to <state file>.jsonl and folded into the
+# state file snapshot every STATE_SNAPSHOT_INTERVAL completions or
+# STATE_FLUSH_SECONDS seconds, whichever comes first
+STATE_JOURNAL_SUFFIX = '.jsonl'
+STATE_SNAPSHOT_INTERVAL = 20
+STATE_FLUSH_SECONDS = 5
+
 # Logging configuration
 MAIN_LOG_FILE = 'wayback_scraper.log'
+DOWNLOAD_LOG_FILE = 'download.log'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Maximum number of download log files kept open by the log listener
+MAX_OPEN_DOWNLOAD_LOGS = 64
 
 # Timeout in seconds
 TIMEOUT = 900  # 15 minutes
 
+# wayback-machine-downloader settings
+WM_DOWNLOADER = "/build/bin/wayback_machine_downloader"
+WM_ONLY_FILTER = r"/(\.(html|htm)$|\/[^\.]*\/?$)/"
+WM_THREADS = 2
+
+# Options shared by every downloader command, after the per-download url/--to/--directory
+WM_COMMAND_OPTIONS = [
+    "-o", WM_ONLY_FILTER,
+    # "-x", r"/\.(jpg|jpeg|png|gif|css|js|svg|ico|woff|ttf|mp4|webp)$/",
+    "-c", str(WM_THREADS),
+]
+
+# Persistent Ruby worker (see wm_worker.rb) used with --persistent-workers
+WM_WORKER_COMMAND = ["ruby", "/build/wm_worker.rb"]
+WM_WORKER_START_TIMEOUT = 60
+WM_WORKER_READY_PREFIX = '{"wm_worker_ready"'
+WM_WORKER_STATUS_PREFIX = '{"wm_worker_status"'
+
+# CSV reader used to load the input file. The stdlib csv module is fastest for
+# typical inputs; the DataFrame backends (imported only when chosen) pay off on
+# very large files.
+IO_BACKENDS = ('csv', 'pandas', 'pyarrow', 'polars')
+DEFAULT_IO_BACKEND = 'csv'
+
+# Number of downloads run in parallel, overall and per site
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PER_HOST_CONCURRENCY = 1
+
+# Wayback CDX API, queried before the downloads to skip URLs without any snapshots.
+# At most CDX_PROBE_WORKERS (and never more than --concurrency) checks run at once,
+# and the checks stop as soon as the API answers with one of CDX_THROTTLE_STATUSES.
+CDX_API_URL = 'https://web.archive.org/cdx/search/cdx'
+CDX_PROBE_TIMEOUT = 30
+CDX_PROBE_WORKERS = 32
+CDX_THROTTLE_STATUSES = (429, 503)
+
+# Backoff when the Wayback Machine rate-limits us (HTTP 429/503 in downloader output):
+# the number of parallel downloads is halved and new downloads wait for the backoff,
+# which doubles on repeated throttling. After a quiet cooldown the limit grows by one.
+# Only status codes in an HTTP context count, since bare numbers like 429 or 503
+# also appear in file counts, snapshot counts and archived paths.
+THROTTLE_PATTERN = re.compile(
+    r'\bHTTP(?:/\d(?:\.\d)?)?:?\s+(?:429|503)\b'
+    r'|\bstatus(?:\s+code)?:?\s*(?:429|503)\b'
+    r'|Too Many Requests|Service Unavailable',
+    re.IGNORECASE
+)
+# Per-file progress lines of the downloader, e.g. "... -> path (429/1200)"
+DOWNLOADER_PROGRESS_PATTERN = re.compile(r'\(\d+/\d+\)$')
+THROTTLE_BACKOFF_INITIAL = 30
+THROTTLE_BACKOFF_MAX = 600
+THROTTLE_COOLDOWN = 300  # 5 minutes
+
+# Translation table deleting every ASCII character that is not allowed in folder names
+FOLDER_NAME_ASCII_TABLE = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128)) if not (c.isalnum() or c in ('-', '_', '.'))
+))
+
+# Characters not allowed in folder names for any domain; \w matches exactly
+# the characters for which str.isalnum() is true, plus '_'
+FOLDER_NAME_INVALID_PATTERN = re.compile(r'[^\w.\-]+')
+
+# Deal dates in the common zero-padded YYYY-MM-DD form
+ISO_DATE_PATTERN = re.compile(r'([0-9]{4})-([0-9]{2})-([0-9]{2})')
+
+# Digest of the last snapshot written to each state file, to skip unchanged writes
+_saved_state_digests = {}
+
+# Directories already created during this run
+_created_dirs = set()
+_created_dirs_lock = threading.Lock()
+
+# A single download; folder is the full output path of folder_name and
+# key is the (url, download key) pair used in the state
+DownloadTask = namedtuple('DownloadTask', ['url', 'date', 'folder', 'folder_name', 'key'])
+
+# Download log records are queued by the workers and written by one listener thread
+_download_log_queue = queue.Queue(-1)
+_download_log_listener = None
+_download_log_listener_lock = threading.Lock()
+
 
-def setup_logging(output_dir):
+class DownloadLogRouter(logging.Handler):
+    """
+    Write queued download log records to the download log file they belong to.
+    Keeps at most max_open files open, closing the least recently used one.
+    """
+    
+    def __init__(self, max_open=MAX_OPEN_DOWNLOAD_LOGS):
+        super().__init__()
+        self.max_open = max_open
+        self.file_handlers = OrderedDict()
+        # Files opened during this run; reopened in append mode after eviction
+        self.opened_files = set()
+        self.formatter = logging.Formatter(LOG_FORMAT)
+    
+    def get_file_handler(self, log_file):
+        file_handler = self.file_handlers.get(log_file)
+        if file_handler is not None:
+            self.file_handlers.move_to_end(log_file)
+            return file_handler
+        
+        mode = 'a' if log_file in self.opened_files else 'w'
+        file_handler = logging.FileHandler(log_file, mode=mode, encoding='utf-8')
+        file_handler.setFormatter(self.formatter)
+        self.file_handlers[log_file] = file_handler
+        self.opened_files.add(log_file)
+        
+        if len(self.file_handlers) > self.max_open:
+            _, evicted = self.file_handlers.popitem(last=False)
+            evicted.close()
+        return file_handler
+    
+    def close_file(self, log_file):
+        file_handler = self.file_handlers.pop(log_file, None)
+        if file_handler is not None:
+            file_handler.close()
+        self.opened_files.discard(log_file)
+    
+    def emit(self, record):
+        log_file = getattr(record, 'log_file', None)
+        if log_file is None:
+            return
+        
+        # Report failures (e.g. a download log that cannot be opened) without
+        # letting them kill the listener thread that serves all downloads
+        try:
+            if getattr(record, 'close_log_file', False):
+                self.close_file(log_file)
+                return
+            
+            self.get_file_handler(log_file).handle(record)
+        except Exception:
+            self.handleError(record)
+    
+    def close(self):
+        for log_file in list(self.file_handlers):
+            self.close_file(log_file)
+        super().close()
+
+
+class StateStore:
+    """
+    Download state kept in memory. Completions are applied to the state right
+    away and handed to a background writer thread, which journals them and
+    rewrites the full state file every STATE_SNAPSHOT_INTERVAL completions or
+    STATE_FLUSH_SECONDS seconds, and once more on close or exit, so downloads
+    never wait for disk I/O. SQLite state files are instead updated in place,
+    one upsert per completion. The set of completed (url, download key) pairs
+    is kept up to date alongside.
+    """
+    
+    def __init__(self, state_file_path):
+        self.state_file_path = state_file_path
+        self.journal_path = get_state_journal_path(state_file_path)
+        self.state = load_state(state_file_path)
+        self.db = None
+        if is_sqlite_state_file(state_file_path):
+            # Raises sqlite3.Error if the file is not a usable database
+            self.db = open_state_db(state_file_path)
+        self.completed_keys = get_completed_keys(self.state)
+        self.lock = threading.Lock()
+        self.dirty = 0
+        self.last_flush = time.monotonic()
+        self.unwritten = []
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, name='state-writer', daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+    
+    def mark(self, completions):
+        """
+        Record a batch of (url, date, folder name, success) completions
+        with one shared timestamp and queue them for the writer thread.
+        """
+        timestamp = datetime.now().isoformat()
+        with self.lock:
+            records = [
+                mark_download_completed(self.state, url, date, folder_name, success, timestamp)
+                for url, date, folder_name, success in completions
+            ]
+        for record in records:
+            key = (record['url'], record['key'])
+            if record['completed']:
+                self.completed_keys.add(key)
+            else:
+                self.completed_keys.discard(key)
+        self.queue.put(records)
+    
+    def write_loop(self):
+        """
+        Writer thread: persist queued records until close() sends None.
+        """
+        stopping = False
+        while not stopping:
+            try:
+                batch = self.queue.get(timeout=STATE_FLUSH_SECONDS)
+            except queue.Empty:
+                batch = []
+            
+            # Collect everything queued so far, noting the sentinel before
+            # writing so a write error can never make the thread miss it
+            records = []
+            while True:
+                if batch is None:
+                    stopping = True
+                    break
+                records.extend(batch)
+                try:
+                    batch = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            
+            try:
+                self.write_records(records)
+                if self.dirty and (self.dirty >= STATE_SNAPSHOT_INTERVAL
+                                   or time.monotonic() - self.last_flush >= STATE_FLUSH_SECONDS):
+                    self.flush()
+            except Exception as e:
+                logging.warning(f"Warning: Could not write state file {self.state_file_path}: {e}")
+    
+    def write_records(self, records):
+        """
+        Persist a batch of records. Records that could not be written are
+        kept and retried with the next batch.
+        """
+        self.unwritten.extend(records)
+        if not self.unwritten:
+            return
+        if self.db is not None:
+            write_state_db(self.db, self.unwritten)
+            self.unwritten = []
+            return
+        append_state_journal(self.journal_path, self.unwritten)
+        self.dirty += len(self.unwritten)
+        self.unwritten = []
+    
+    def flush(self):
+        """
+        Write the state file now and drop the journal.
+        """
+        if self.db is not None:
+            return
+        # Serialize under the lock, but write the file without holding it
+        with self.lock:
+            data = serialize_state(self.state, self.state_file_path)
+        if write_state_file(data, self.state_file_path):
+            remove_state_journal(self.state_file_path)
+        self.dirty = 0
+        self.last_flush = time.monotonic()
+    
+    def close(self):
+        """
+        Stop the writer thread and write the final state file;
+        also run at interpreter exit.
+        """
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        self.flush()
+        if self.db is not None:
+            # Last attempt for records the writer thread could not store:
+            # upsert the whole in-memory state
+            if self.unwritten:
+                try:
+                    write_state_db(self.db, iter_state_records(self.state))
+                    self.unwritten = []
+                except sqlite3.Error as e:
+                    logging.warning(f"Warning: Could not save state file {self.state_file_path}: {e}")
+            self.db.close()
+            self.db = None
+        atexit.unregister(self.close)
+
+
+class AdaptiveLimiter:
+    """
+    Async context manager limiting the number of parallel downloads.
+    The limit is halved with an exponential backoff when the Wayback Machine
+    throttles us and grows back by one per quiet THROTTLE_COOLDOWN period.
+    """
+    
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.active = 0
+        self.backoff = 0
+        self.resume_at = 0
+        self.last_change = 0
+        self.condition = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        
+        # Hold new downloads back while backing off
+        delay = self.resume_at - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self.condition:
+            self.active -= 1
+            now = asyncio.get_running_loop().time()
+            if self.limit < self.max_limit and now - self.last_change >= THROTTLE_COOLDOWN:
+                self.limit += 1
+                self.backoff = 0
+                self.last_change = now
+                logging.info(f"No throttling for {THROTTLE_COOLDOWN}s, "
+                             f"raising parallel downloads to {self.limit}")
+            self.condition.notify_all()
+    
+    def throttle(self):
+        """
+        Record a rate-limit response from the Wayback Machine.
+        """
+        now = asyncio.get_running_loop().time()
+        if now < self.resume_at:
+            # Already backing off for an earlier response
+            return
+        
+        self.backoff = min(max(self.backoff * 2, THROTTLE_BACKOFF_INITIAL), THROTTLE_BACKOFF_MAX)
+        self.resume_at = now + self.backoff
+        self.limit = max(1, self.limit // 2)
+        self.last_change = now
+        logging.warning(f"Warning: Wayback Machine is rate limiting, backing off {self.backoff}s "
+                        f"and reducing parallel downloads to {self.limit}")
+
+
+class WorkerStartError(RuntimeError):
+    """
+    Raised when a persistent downloader worker cannot be started.
+    """
+
+
+class WaybackWorkerPool:
+    """
+    Pool of long-lived wm_worker.rb processes shared by the running downloads.
+    Each worker loads wayback-machine-downloader once and runs one download at
+    a time. Workers are started on demand and replaced when they die or time out.
+    """
+    
+    def __init__(self, command=None):
+        self.command = command or WM_WORKER_COMMAND
+        self.available = True
+        self.idle = []
+        self.workers = set()
+    
+    async def start_worker(self):
+        try:
+            worker = await asyncio.create_subprocess_exec(
+                *self.command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+        except OSError as e:
+            raise WorkerStartError(f"could not run {' '.join(self.command)}: {e}") from e
+        
+        # Wait for the ready line, which is only printed once the downloader is loaded
+        try:
+            ready = await asyncio.wait_for(worker.stdout.readline(), WM_WORKER_START_TIMEOUT)
+        except (asyncio.TimeoutError, ValueError):
+            ready = b''
+        ready = ready.decode('utf-8', errors='replace')
+        
+        if not ready.startswith(WM_WORKER_READY_PREFIX):
+            await self.discard(worker)
+            raise WorkerStartError(f"worker did not start: {ready.strip() or 'no output'}")
+        
+        self.workers.add(worker)
+        return worker
+    
+    async def acquire(self):
+        if self.idle:
+            return self.idle.pop()
+        
+        try:
+            return await self.start_worker()
+        except WorkerStartError as e:
+            if self.available:
+                self.available = False
+                logging.warning(f"Warning: Persistent workers unavailable ({e}); "
+                                f"falling back to one downloader process per download")
+            raise
+    
+    async def discard(self, worker):
+        self.workers.discard(worker)
+        if worker.returncode is None:
+            worker.kill()
+        await worker.wait()
+    
+    async def read_status(self, worker, download_logger, limiter=None):
+        async for line in read_lines(worker.stdout):
+            if line.startswith(WM_WORKER_STATUS_PREFIX):
+                return json.loads(line)
+            log_output_line(download_logger, line, limiter)
+        return None
+    
+    async def run(self, url, date, output_folder, download_logger, limiter=None):
+        """
+        Run one download on a worker and stream its output to download_logger.
+        Raises the same subprocess exceptions as running the downloader directly.
+        """
+        worker = await self.acquire()
+        request = json.dumps({
+            'url': url,
+            'to': date,
+            'directory': output_folder,
+            'only': WM_ONLY_FILTER,
+            'concurrency': WM_THREADS,
+        })
+        download_logger.info(f"Persistent worker (pid {worker.pid}) request: {request}")
+        
+        try:
+            worker.stdin.write((request + "\n").encode('utf-8'))
+            await worker.stdin.drain()
+            status = await asyncio.wait_for(self.read_status(worker, download_logger, limiter), TIMEOUT)
+        except asyncio.TimeoutError:
+            await self.discard(worker)
+            raise subprocess.TimeoutExpired(self.command, TIMEOUT) from None
+        except OSError:
+            # The worker died before taking the request
+            status = None
+        except BaseException:
+            # Cancelled mid-download; the worker cannot be reused
+            await self.discard(worker)
+            raise
+        
+        if status is None:
+            await self.discard(worker)
+            raise subprocess.CalledProcessError(worker.returncode, self.command)
+        
+        self.idle.append(worker)
+        if status['wm_worker_status'] != 0:
+            if status.get('error'):
+                download_logger.error(f"Error details:\n{status['error']}")
+            raise subprocess.CalledProcessError(status['wm_worker_status'], self.command)
+    
+    async def close(self):
+        workers = list(self.workers)
+        self.workers.clear()
+        self.idle.clear()
+        for worker in workers:
+            # Closing stdin ends the worker's request loop
+            try:
+                worker.stdin.close()
+                await asyncio.wait_for(worker.wait(), 5)
+            except (OSError, asyncio.TimeoutError):
+                if worker.returncode is None:
+                    worker.kill()
+                await worker.wait()
+
+
+def setup_logging(output_dir, verbose=False):
     """
     Setup logging configuration for both console and file output.
+    With verbose, per-row debug details are logged as well.
     """
     # Create logs directory
     logs_dir = os.path.join(output_dir, 'logs')
@@ -49,8 +569,8 @@ def setup_logging(output_dir):
     
     # Configure logging for main script only
     logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=logging.DEBUG if verbose else logging.INFO,
+        format=LOG_FORMAT,
         handlers=[
             # Console handler
             logging.StreamHandler(sys.stdout),
@@ -59,147 +579,440 @@ def setup_logging(output_dir):
         ]
     )
     
+    start_download_log_listener()
+    
     logger = logging.getLogger(__name__)
     logger.info(f"Logging initialized. Main log file: {main_log_path}")
     return logger
 
 
+def start_download_log_listener():
+    """
+    Start the background listener that writes all download logs.
+    Safe to call more than once; the listener is stopped at exit.
+    """
+    global _download_log_listener
+    with _download_log_listener_lock:
+        if _download_log_listener is not None:
+            return
+        _download_log_listener = logging.handlers.QueueListener(_download_log_queue, DownloadLogRouter())
+        _download_log_listener.start()
+        atexit.register(stop_download_log_listener)
+
+
+def stop_download_log_listener():
+    """
+    Flush pending download log records and close all download log files.
+    """
+    global _download_log_listener
+    with _download_log_listener_lock:
+        if _download_log_listener is None:
+            return
+        _download_log_listener.stop()
+        for handler in _download_log_listener.handlers:
+            handler.close()
+        _download_log_listener = None
+
+
 def create_download_logger(download_folder, url, date):
     """
     Create a specific logger for each download operation.
+    Records are handed to the download log listener, which writes them to
+    download.log in the download folder.
     """
-    log_file = os.path.join(download_folder, 'download.log')
-    
-    # Create file handler for this specific download
-    file_handler = logging.FileHandler(log_file, mode='w', encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
+    log_file = os.path.join(download_folder, DOWNLOAD_LOG_FILE)
+    start_download_log_listener()
     
-    # Create formatter
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
+    def tag_record(record):
+        record.log_file = log_file
+        return True
     
-    # Create logger
-    logger = logging.getLogger(f'download_{url}_{date}')
-    logger.setLevel(logging.INFO)
+    # Not created through getLogger, so it is not kept alive in the logging registry
+    logger = logging.Logger(f'download_{url}_{date}', logging.INFO)
     logger.propagate = False  # Prevent propagation to main logger
-    logger.addHandler(file_handler)
+    logger.addFilter(tag_record)
+    logger.addHandler(logging.handlers.QueueHandler(_download_log_queue))
     
     return logger, log_file
 
 
+def close_download_logger(logger, log_file):
+    """
+    Detach a download logger and let the listener close its log file.
+    """
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    _download_log_queue.put_nowait(logging.makeLogRecord({'log_file': log_file, 'close_log_file': True}))
+
+
+@contextlib.contextmanager
+def download_log(download_folder, url, date):
+    """
+    Context manager yielding (logger, log file path) for a download
+    and closing the download log when the block exits.
+    """
+    logger, log_file = create_download_logger(download_folder, url, date)
+    try:
+        yield logger, log_file
+    finally:
+        close_download_logger(logger, log_file)
+
+
+def get_state_journal_path(state_file_path):
+    """
+    Get the path of the append-only journal that belongs to a state file.
+    """
+    return state_file_path + STATE_JOURNAL_SUFFIX
+
+
+def is_msgpack_state_file(state_file_path):
+    """
+    Check if a state file is stored as MessagePack rather than JSON.
+    """
+    return state_file_path.endswith(STATE_MSGPACK_SUFFIXES)
+
+
+def is_sqlite_state_file(state_file_path):
+    """
+    Check if a state file is a SQLite database.
+    """
+    return state_file_path.endswith(STATE_SQLITE_SUFFIXES)
+
+
+def open_state_db(state_file_path):
+    """
+    Open (creating if needed) a SQLite state database in WAL mode.
+    Transactions are managed explicitly by write_state_db.
+    """
+    db = sqlite3.connect(state_file_path, isolation_level=None, check_same_thread=False)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(STATE_DB_SCHEMA)
+    except sqlite3.Error:
+        db.close()
+        raise
+    return db
+
+
+def read_state_db(db):
+    """
+    Read a SQLite state database into the nested state dict.
+    """
+    state = {}
+    for url_key, download_key, completed, timestamp, folder in db.execute(
+        "SELECT url, key, completed, timestamp, folder FROM downloads"
+    ):
+        state.setdefault(url_key, {'downloads': {}})['downloads'][download_key] = {
+            'completed': bool(completed),
+            'timestamp': timestamp,
+            'folder': folder
+        }
+    return state
+
+
+def write_state_db(db, records):
+    """
+    Upsert download records (see mark_download_completed) in a single transaction.
+    """
+    db.execute("BEGIN")
+    try:
+        db.executemany(
+            "INSERT OR REPLACE INTO downloads (url, key, completed, timestamp, folder) "
+            "VALUES (:url, :key, :completed, :timestamp, :folder)",
+            records
+        )
+    except sqlite3.Error:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def iter_state_records(state):
+    """
+    Yield every download in the nested state dict as a flat record.
+    """
+    for url_key, url_state in state.items():
+        for download_key, entry in url_state.get('downloads', {}).items():
+            yield {
+                'url': url_key,
+                'key': download_key,
+                'completed': entry.get('completed', False),
+                'timestamp': entry.get('timestamp'),
+                'folder': entry.get('folder')
+            }
+
+
+def serialize_state(state, state_file_path):
+    """
+    Serialize the state in the format matching the state file extension.
+    """
+    if is_msgpack_state_file(state_file_path):
+        return msgpack.packb(state, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(state)
+    return json.dumps(state, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def deserialize_state(data, state_file_path):
+    """
+    Parse state file contents in the format matching the state file extension.
+    """
+    if is_msgpack_state_file(state_file_path):
+        return msgpack.unpackb(data, raw=False)
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 def load_state(state_file_path):
     """
-    Load the state from JSON file.
+    Load the state from JSON (or MessagePack or SQLite) file and replay any
+    journaled downloads that were not yet folded into it.
     Returns empty dict if file doesn't exist.
     """
-    if os.path.exists(state_file_path):
+    state = {}
+    if is_sqlite_state_file(state_file_path):
+        if os.path.exists(state_file_path):
+            try:
+                db = open_state_db(state_file_path)
+                try:
+                    state = read_state_db(db)
+                finally:
+                    db.close()
+                logging.info(f"Loaded state from {state_file_path}")
+            except sqlite3.Error as e:
+                logging.warning(f"Warning: Could not load state file {state_file_path}: {e}")
+                logging.info("Starting fresh...")
+    elif os.path.exists(state_file_path):
         try:
-            with open(state_file_path, 'r') as f:
-                state = json.load(f)
+            with open(state_file_path, 'rb') as f:
+                state = deserialize_state(f.read(), state_file_path)
                 logging.info(f"Loaded state from {state_file_path}")
-                return state
-        except (json.JSONDecodeError, IOError) as e:
+        except (ValueError, IOError) as e:
             logging.warning(f"Warning: Could not load state file {state_file_path}: {e}")
             logging.info("Starting fresh...")
-    return {}
+    
+    replay_state_journal(state, get_state_journal_path(state_file_path))
+    return state
+
+
+def replay_state_journal(state, journal_path):
+    """
+    Apply the entries of a state journal on top of the loaded state.
+    Entries are applied in order, so later ones win.
+    """
+    if not os.path.exists(journal_path):
+        return
+    
+    replayed = 0
+    try:
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    url_key = entry.pop('url')
+                    download_key = entry.pop('key')
+                except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                    # A crash mid-write can leave a truncated last line
+                    continue
+                state.setdefault(url_key, {}).setdefault('downloads', {})[download_key] = entry
+                replayed += 1
+    except IOError as e:
+        logging.warning(f"Warning: Could not read state journal {journal_path}: {e}")
+        return
+    
+    logging.info(f"Replayed {replayed} entries from state journal {journal_path}")
+
+
+def append_state_journal(journal_path, records):
+    """
+    Append a batch of download records (see mark_download_completed) to the state journal.
+    """
+    try:
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record) + "\n" for record in records))
+    except IOError as e:
+        logging.warning(f"Warning: Could not write state journal {journal_path}: {e}")
 
 
 def save_state(state, state_file_path):
     """
-    Save the state to JSON file.
+    Save the state to JSON (or MessagePack or SQLite) file.
+    The file is replaced atomically, so a crash never leaves a partial state file,
+    and the write is skipped if the file already holds the same state.
+    Returns True if the state file is up to date.
     """
+    if is_sqlite_state_file(state_file_path):
+        try:
+            db = open_state_db(state_file_path)
+            try:
+                write_state_db(db, iter_state_records(state))
+            finally:
+                db.close()
+            logging.info(f"State saved to {state_file_path}")
+            return True
+        except sqlite3.Error as e:
+            logging.warning(f"Warning: Could not save state file {state_file_path}: {e}")
+            return False
+    
+    return write_state_file(serialize_state(state, state_file_path), state_file_path)
+
+
+def write_state_file(data, state_file_path):
+    """
+    Atomically replace the state file with already serialized state data,
+    unless it already holds exactly this data.
+    Returns True if the state file is up to date.
+    """
+    digest = hashlib.blake2b(data, digest_size=16).digest()
+    if _saved_state_digests.get(state_file_path) == digest and os.path.exists(state_file_path):
+        return True
+    
+    tmp_path = state_file_path + '.tmp'
     try:
-        with open(state_file_path, 'w') as f:
-            json.dump(state, f, indent=2)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, state_file_path)
+        _saved_state_digests[state_file_path] = digest
         logging.info(f"State saved to {state_file_path}")
+        return True
     except IOError as e:
         logging.warning(f"Warning: Could not save state file {state_file_path}: {e}")
+        return False
 
 
-def is_download_completed(state, website_url, date, folder_name):
+def export_state(state_file_path, export_file_path):
+    """
+    Copy a state file into another format, e.g. a SQLite state to JSON.
+    Returns True if the export was written.
+    """
+    return save_state(load_state(state_file_path), export_file_path)
+
+
+def remove_state_journal(state_file_path):
+    """
+    Delete the journal of a state file once a snapshot covers it.
+    """
+    journal_path = get_state_journal_path(state_file_path)
+    try:
+        os.remove(journal_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.warning(f"Warning: Could not remove state journal {journal_path}: {e}")
+
+
+def get_download_key(website_url, date, folder_name):
+    """
+    Get the (url, download key) pair identifying a download in the state.
+    """
+    return website_url.strip(), f"{date}_{folder_name}"
+
+
+def get_completed_keys(state):
+    """
+    Build the set of (url, download key) pairs marked as completed in the state.
+    """
+    return {
+        (url_key, download_key)
+        for url_key, url_state in state.items()
+        for download_key, entry in url_state.get('downloads', {}).items()
+        if entry.get('completed', False)
+    }
+
+
+def is_download_completed(completed_keys, key):
     """
     Check if a specific download has been completed.
     """
-    url_key = website_url.strip()
-    if url_key not in state:
-        return False
-    
-    downloads = state[url_key].get('downloads', {})
-    download_key = f"{date}_{folder_name}"
-    return downloads.get(download_key, {}).get('completed', False)
+    return key in completed_keys
 
 
-def mark_download_completed(state, website_url, date, folder_name, success=True):
+def mark_download_completed(state, website_url, date, folder_name, success=True, timestamp=None):
     """
     Mark a download as completed in the state.
+    Returns the matching state journal record.
     """
-    url_key = website_url.strip()
+    url_key, download_key = get_download_key(website_url, date, folder_name)
     if url_key not in state:
         state[url_key] = {'downloads': {}}
     
     if 'downloads' not in state[url_key]:
         state[url_key]['downloads'] = {}
     
-    download_key = f"{date}_{folder_name}"
-    state[url_key]['downloads'][download_key] = {
+    entry = {
         'completed': success,
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': timestamp or datetime.now().isoformat(),
         'folder': folder_name
     }
+    state[url_key]['downloads'][download_key] = entry
+    
+    return {'url': url_key, 'key': download_key, **entry}
 
 
-def get_resume_stats(state, df):
+def ensure_dir(path):
     """
-    Get statistics about what can be resumed.
+    Create a directory and its parents, skipping directories this run already created.
     """
-    total_downloads = len(df) * 2  # Each row has 2 downloads
-    completed_downloads = 0
+    with _created_dirs_lock:
+        if path in _created_dirs:
+            return
     
-    for _, row in df.iterrows():
-        website_url = str(row[WEBSITE_URL_COLUMN]).strip()
-        deal_date = str(row[DEAL_DATE_COLUMN]).strip()
-        
-        first_date, second_date = calculate_download_dates(deal_date)
-        if first_date is None or second_date is None:
-            continue
-            
-        sanitized_name = sanitize_folder_name(website_url)
-        first_date_folder = f"{sanitized_name}_up_to_{first_date}"
-        second_date_folder = f"{sanitized_name}_up_to_{second_date}"
-        
-        if is_download_completed(state, website_url, first_date, first_date_folder):
-            completed_downloads += 1
-        if is_download_completed(state, website_url, second_date, second_date_folder):
-            completed_downloads += 1
+    # A single stat is cheaper than mkdir walking every path component
+    if not os.path.isdir(path):
+        Path(path).mkdir(parents=True, exist_ok=True)
     
-    return completed_downloads, total_downloads
+    with _created_dirs_lock:
+        _created_dirs.add(path)
 
 
+def get_url_domain(url):
+    """
+    Return the lower-cased domain of a URL, used to group downloads of the same site.
+    """
+    parsed = urlparse(url)
+    return (parsed.netloc or parsed.path).lower()
+
+
+@functools.lru_cache(maxsize=None)
 def sanitize_folder_name(url):
     """
     Sanitize URL to create a valid folder name.
     """
     parsed = urlparse(url)
     domain = parsed.netloc or parsed.path
-    # Remove invalid characters for folder names
-    sanitized = "".join(c for c in domain if c.isalnum() or c in ('-', '_', '.'))
-    return sanitized
+    # Remove invalid characters for folder names, in a single C-level pass
+    # (translate for the usual ASCII domains, the compiled regex otherwise)
+    if domain.isascii():
+        return domain.translate(FOLDER_NAME_ASCII_TABLE)
+    return FOLDER_NAME_INVALID_PATTERN.sub('', domain)
 
 
+@functools.lru_cache(maxsize=4096)
 def parse_deal_date(deal_date_str):
     """
     Parse deal date string to datetime object.
     Handles format like "2016-09-30 00:00:00"
+    Results are cached since the same deal dates recur across rows.
     """
     try:
         # Remove time part if present and parse date
         date_part = deal_date_str.split()[0]
+        
+        # Fast path for zero-padded dates, skipping strptime's format parsing
+        match = ISO_DATE_PATTERN.fullmatch(date_part)
+        if match:
+            return datetime(*map(int, match.groups()))
         return datetime.strptime(date_part, '%Y-%m-%d')
-    except (ValueError, AttributeError) as e:
+    except (ValueError, AttributeError, IndexError) as e:
         logging.warning(f"Could not parse deal date '{deal_date_str}': {e}")
         return None
 
 
+@functools.lru_cache(maxsize=None)
 def calculate_download_dates(deal_date_str):
     """
     Calculate first date (6 months before deal) and second date (1 year after deal).
@@ -218,194 +1031,482 @@ def calculate_download_dates(deal_date_str):
     return first_date.strftime('%Y%m%d'), second_date.strftime('%Y%m%d')
 
 
-def run_wayback_downloader(url, date, output_folder, state, state_file_path):
+def calculate_download_date_columns(deal_dates):
     """
-    Run wayback-machine-downloader with specified parameters.
+    Vectorized version of calculate_download_dates for a whole Series of deal dates.
+    Returns two Series of YYYYMMDD strings, missing where the deal date is invalid.
     """
-    folder_name = os.path.basename(output_folder)
+    import pandas as pd
     
-    # Check if already completed
-    if is_download_completed(state, url, date, folder_name):
-        logging.info(f"Skipping {url} (up to {date}) - already completed")
-        return True
+    # Remove time part if present and parse all dates in one pass
+    deal = pd.to_datetime(deal_dates.str.split(n=1).str[0], format='%Y-%m-%d', errors='coerce')
+    first_dates = (deal - pd.DateOffset(months=MONTHS_BEFORE_DEAL)).dt.strftime('%Y%m%d')
+    second_dates = (deal + pd.DateOffset(months=MONTHS_AFTER_DEAL)).dt.strftime('%Y%m%d')
     
-    logging.info(f"Downloading {url} up to {date} into {output_folder}")
+    # Retry whatever the vectorized parser rejected with the scalar parser,
+    # which also logs a warning for dates that are really invalid
+    for index in deal.index[deal.isna()]:
+        first_dates.loc[index], second_dates.loc[index] = calculate_download_dates(deal_dates.loc[index])
     
-    # Create output folder if it doesn't exist
-    Path(output_folder).mkdir(parents=True, exist_ok=True)
+    return first_dates, second_dates
+
+
+def has_wayback_snapshots(url, to_date, throttled=None):
+    """
+    Ask the Wayback CDX API whether the site has any snapshot up to the given date.
+    Returns True when the API cannot be reached, so the download is still tried.
+    If a `throttled` event is given, it is set when the API rate-limits us, and
+    no request is made once it is set.
+    """
+    if throttled is not None and throttled.is_set():
+        return True
     
-    # Create download-specific logger
-    download_logger, log_file = create_download_logger(output_folder, url, date)
+    params = urlencode({'url': url, 'matchType': 'prefix', 'to': to_date, 'limit': 1, 'output': 'json'})
+    try:
+        with urllib.request.urlopen(f"{CDX_API_URL}?{params}", timeout=CDX_PROBE_TIMEOUT) as response:
+            data = response.read()
+        # The JSON output is a header row followed by one row per snapshot
+        return len(json.loads(data) if data.strip() else []) > 1
+    except urllib.error.HTTPError as e:
+        if throttled is not None and e.code in CDX_THROTTLE_STATUSES:
+            if not throttled.is_set():
+                throttled.set()
+                logging.warning(f"Warning: CDX API is rate limiting (HTTP {e.code}), "
+                                f"skipping the remaining availability checks")
+            return True
+        logging.warning(f"Warning: CDX check failed for {url} up to {to_date}, downloading anyway: {e}")
+        return True
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        logging.warning(f"Warning: CDX check failed for {url} up to {to_date}, downloading anyway: {e}")
+        return True
+
+
+def filter_archived_tasks(tasks, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Check all download tasks against the CDX API, at most `concurrency` at a time,
+    and return only those that have snapshots to download. Once the API
+    rate-limits us, the remaining tasks are let through unchecked.
+    """
+    if not tasks:
+        return tasks
     
-    # Prepare wayback-machine-downloader command
-    cmd = [
-        "/build/bin/wayback_machine_downloader",
-        url,
-        "--to", date,
-        "--directory", output_folder,
-        "-o", r"/(\.(html|htm)$|\/[^\.]*\/?$)/",
-        # "-x", r"/\.(jpg|jpeg|png|gif|css|js|svg|ico|woff|ttf|mp4|webp)$/",
-        "-c", "2",
-    ]
+    logging.info(f"Checking Wayback availability of {len(tasks)} downloads")
+    throttled = threading.Event()
+    with ThreadPoolExecutor(max_workers=min(CDX_PROBE_WORKERS, concurrency)) as executor:
+        available = list(executor.map(
+            lambda task: has_wayback_snapshots(task.url, task.date, throttled), tasks
+        ))
+    
+    archived = []
+    for task, is_available in zip(tasks, available):
+        if is_available:
+            archived.append(task)
+        else:
+            logging.warning(f"Skipping {task.url} up to {task.date} - no Wayback snapshots")
+    return archived
+
+
+def log_output_line(download_logger, line, limiter=None):
+    """
+    Write a line of downloader output to the download log,
+    telling the limiter if it reports rate limiting.
+    """
+    line = line.rstrip()
+    download_logger.info(line)
+    if (limiter is not None and THROTTLE_PATTERN.search(line)
+            and not DOWNLOADER_PROGRESS_PATTERN.search(line)):
+        limiter.throttle()
+
+
+async def read_lines(stream):
+    """
+    Yield decoded lines from an asyncio stream until EOF.
+    Lines longer than the stream buffer limit are yielded in pieces.
+    """
+    while True:
+        try:
+            line = await stream.readuntil(b'\n')
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                yield e.partial.decode('utf-8', errors='replace')
+            return
+        except asyncio.LimitOverrunError as e:
+            line = await stream.readexactly(e.consumed)
+        yield line.decode('utf-8', errors='replace')
+
+
+async def run_download_command(cmd, download_logger, limiter=None):
+    """
+    Run the downloader command and stream its output to the download log line by line.
+    Raises TimeoutExpired after TIMEOUT seconds and CalledProcessError on failure.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
     
-    success = False
-    start_time = time.time()
+    async def stream_output():
+        async for line in read_lines(process.stdout):
+            log_output_line(download_logger, line, limiter)
+        return await process.wait()
     
     try:
-        # Log the command that will be run
-        download_logger.info(f"Starting download for {url} up to {date}")
-        download_logger.info(f"Command: {' '.join(cmd)}")
-        download_logger.info(f"Output folder: {output_folder}")
-        download_logger.info(f"Log file: {log_file}")
-        download_logger.info("-" * 80)
-        
-        # Run the command and capture output
-        result = subprocess.run(
-            cmd,
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=TIMEOUT
-        )
+        return_code = await asyncio.wait_for(stream_output(), TIMEOUT)
+    except asyncio.TimeoutError:
+        raise subprocess.TimeoutExpired(cmd, TIMEOUT) from None
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    
+    if return_code != 0:
+        raise subprocess.CalledProcessError(return_code, cmd)
+
 
-        # Log successful completion
-        download_logger.info("Download completed successfully")
-        if result.stdout:
-            download_logger.info(f"Command output:\n{result.stdout}")
+async def run_download(cmd, url, date, output_folder, download_logger, worker_pool=None, limiter=None):
+    """
+    Run a single download on a persistent worker when a pool is given,
+    otherwise (or if workers cannot be started) as its own process.
+    The download log records which of the two actually ran.
+    """
+    if worker_pool is not None and worker_pool.available:
+        try:
+            await worker_pool.run(url, date, output_folder, download_logger, limiter)
+            return
+        except WorkerStartError:
+            download_logger.warning("Persistent workers unavailable, running the downloader directly")
+    
+    download_logger.info(f"Command: {' '.join(cmd)}")
+    await run_download_command(cmd, download_logger, limiter)
+
+
+async def run_wayback_downloader(url, date, output_folder, worker_pool=None, limiter=None):
+    """
+    Run wayback-machine-downloader with specified parameters.
+    Returns True if the download succeeded.
+    """
+    logging.info("Downloading %s up to %s into %s", url, date, output_folder)
+    
+    # Create output folder if it doesn't exist
+    ensure_dir(output_folder)
+    
+    # Create download-specific logger; its log file is closed when the block exits
+    with download_log(output_folder, url, date) as (download_logger, log_file):
+        # Prepare wayback-machine-downloader command
+        cmd = [WM_DOWNLOADER, url, "--to", date, "--directory", output_folder, *WM_COMMAND_OPTIONS]
         
-        success = True
-            
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Error downloading {url} (up to {date}): {e}"
-        download_logger.error(error_msg)
-        if e.stderr:
-            download_logger.error(f"Error details:\n{e.stderr}")
-        if e.stdout:
-            download_logger.info(f"Command output:\n{e.stdout}")
-        logging.error(error_msg)
+        success = False
+        start_time = time.time()
         
-    except subprocess.TimeoutExpired:
-        error_msg = f"Timeout downloading {url} (up to {date})"
-        download_logger.error(error_msg)
-        logging.error(error_msg)
+        try:
+            # Log the download header as a single record; run_download adds
+            # the command or worker request that actually runs
+            if download_logger.isEnabledFor(logging.INFO):
+                download_logger.info(
+                    f"Starting download for {url} up to {date}\n"
+                    f"Output folder: {output_folder}\n"
+                    f"Log file: {log_file}\n"
+                    + "-" * 80
+                )
+            
+            # Run the download, streaming its output to the download log
+            await run_download(cmd, url, date, output_folder, download_logger, worker_pool, limiter)
+
+            # Log successful completion
+            download_logger.info("Download completed successfully")
+            success = True
+                
+        except subprocess.CalledProcessError as e:
+            error_msg = f"Error downloading {url} (up to {date}): {e}"
+            download_logger.error(error_msg)
+            logging.error(error_msg)
+            
+        except subprocess.TimeoutExpired:
+            error_msg = f"Timeout downloading {url} (up to {date})"
+            download_logger.error(error_msg)
+            logging.error(error_msg)
+            
+        except Exception as e:
+            error_msg = f"Unexpected error downloading {url} (up to {date}): {e}"
+            download_logger.error(error_msg)
+            logging.error(error_msg)
         
-    except Exception as e:
-        error_msg = f"Unexpected error downloading {url} (up to {date}): {e}"
-        download_logger.error(error_msg)
-        logging.error(error_msg)
+        finally:
+            # Calculate and log timing information
+            end_time = time.time()
+            duration = end_time - start_time
+            duration_minutes = duration / 60
+            duration_seconds = duration % 60
+            
+            # Log timing to main log
+            if success:
+                logging.info("Successfully downloaded %s (up to %s)", url, date)
+            else:
+                logging.error("Failed to download %s (up to %s)", url, date)
+            
+            logging.info("Duration: %dm %.1fs", duration_minutes, duration_seconds)
+            logging.info("Download log saved to: %s", log_file)
+            
+            # Always log completion status to download logger
+            if download_logger.isEnabledFor(logging.INFO):
+                download_logger.info(
+                    f"Download process finished for {url} (up to {date})\n"
+                    f"Success: {success}\n"
+                    f"Duration: {int(duration_minutes)}m {duration_seconds:.1f}s\n"
+                    + "-" * 80
+                )
+    
+    return success
+
+
+async def run_downloads(tasks, store, concurrency=DEFAULT_CONCURRENCY, persistent_workers=False,
+                        per_host=DEFAULT_PER_HOST_CONCURRENCY):
+    """
+    Run the downloads on a single event loop, at most `concurrency` at a time
+    (fewer while the Wayback Machine is rate limiting us). Downloads that finish
+    together are marked in the state store as one batch. At most `per_host`
+    downloads of the same site run at once, while different sites run in parallel.
+    Progress is shown with tqdm on a terminal and logged otherwise.
+    """
+    limiter = AdaptiveLimiter(concurrency)
+    worker_pool = WaybackWorkerPool() if persistent_workers else None
+    domain_slots = {}
+    
+    async def run_task(task, domain_slot):
+        # Wait for the site before taking a download slot, so queued downloads
+        # of a busy site do not hold slots other sites could use
+        async with domain_slot:
+            async with limiter:
+                return await run_wayback_downloader(task.url, task.date, task.folder, worker_pool, limiter)
+    
+    running = {}
+    for task in tasks:
+        domain = get_url_domain(task.url)
+        if domain not in domain_slots:
+            domain_slots[domain] = asyncio.Semaphore(per_host)
+        running[asyncio.ensure_future(run_task(task, domain_slots[domain]))] = task
     
+    progress = None
+    log_redirect = contextlib.nullcontext()
+    if tqdm is not None and sys.stderr.isatty():
+        progress = tqdm(total=len(tasks), unit='download')
+        # Print console log lines above the bar instead of tearing through it
+        log_redirect = logging_redirect_tqdm()
+    finished = 0
+    failed = 0
+    try:
+        with log_redirect:
+            pending = set(running)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                
+                # Mark the batch as completed (or failed)
+                completions = []
+                for download in done:
+                    task = running.pop(download)
+                    success = download.result()
+                    failed += not success
+                    completions.append((task.url, task.date, task.folder_name, success))
+                store.mark(completions)
+                
+                finished += len(done)
+                if progress is not None:
+                    progress.update(len(done))
+                else:
+                    logging.info("Progress: %d/%d downloads finished (%d failed)", finished, len(tasks), failed)
     finally:
-        # Calculate and log timing information
-        end_time = time.time()
-        duration = end_time - start_time
-        duration_minutes = duration / 60
-        duration_seconds = duration % 60
-        
-        # Log timing to main log
-        if success:
-            logging.info(f"Successfully downloaded {url} (up to {date})")
-        else:
-            logging.error(f"Failed to download {url} (up to {date})")
-        
-        logging.info(f"Duration: {int(duration_minutes)}m {duration_seconds:.1f}s")
-        logging.info(f"Download log saved to: {log_file}")
-        
-        # Always log completion status to download logger
-        download_logger.info(f"Download process finished for {url} (up to {date})")
-        download_logger.info(f"Success: {success}")
-        download_logger.info(f"Duration: {int(duration_minutes)}m {duration_seconds:.1f}s")
-        download_logger.info("-" * 80)
-        
-        # Remove the download logger handler to avoid memory leaks
-        for handler in download_logger.handlers[:]:
-            handler.close()
-            download_logger.removeHandler(handler)
+        if progress is not None:
+            progress.close()
+        for download in running:
+            download.cancel()
+        if worker_pool is not None:
+            await worker_pool.close()
+
+
+def read_csv_header(csv_file):
+    """
+    Read only the header row of the semicolon-separated CSV file.
+    Returns an empty list if the file is empty.
+    """
+    with open(csv_file, 'r', newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f, delimiter=';'), [])
+
+
+def read_csv(csv_file, columns, io_backend=DEFAULT_IO_BACKEND):
+    """
+    Read the given columns of the semicolon-separated CSV file into a pandas DataFrame.
+    Falls back to the pandas C parser if the requested backend is not installed.
+    """
+    import pandas as pd
     
-    # Mark as completed (or failed) and save state
-    mark_download_completed(state, url, date, folder_name, success)
-    save_state(state, state_file_path)
+    if io_backend in ('polars', 'pyarrow') and importlib.util.find_spec(io_backend) is None:
+        logging.warning(f"Warning: {io_backend} is not installed, falling back to pandas CSV reader")
+        io_backend = 'pandas'
     
-    return success
+    if io_backend == 'polars':
+        import polars as pl
+        df = pl.read_csv(csv_file, separator=';', columns=columns, infer_schema_length=0)
+        return pd.DataFrame(df.to_dict(as_series=False), columns=columns)
+    
+    if io_backend == 'pyarrow':
+        return pd.read_csv(csv_file, sep=';', engine='pyarrow', usecols=columns, dtype=str)
+    
+    return pd.read_csv(csv_file, sep=';', engine='c', usecols=columns, dtype=str)
 
 
-def process_csv(csv_file, output_base_dir, state_file_path):
+def read_download_rows(csv_file, io_backend=DEFAULT_IO_BACKEND):
+    """
+    Read the CSV file into a list of (url, deal date, first date, second date,
+    sanitized name) tuples. The download dates are empty for invalid deal dates.
+    """
+    if io_backend != 'csv' and importlib.util.find_spec('pandas') is None:
+        logging.warning("Warning: pandas is not installed, falling back to csv reader")
+        io_backend = 'csv'
+    
+    # Download dates and folder names are cached, so repeated deal dates
+    # and URLs are only computed once
+    if io_backend == 'csv':
+        rows = []
+        with open(csv_file, 'r', newline='', encoding='utf-8-sig') as f:
+            for record in csv.DictReader(f, delimiter=';'):
+                website_url = (record.get(WEBSITE_URL_COLUMN) or '').strip()
+                deal_date = (record.get(DEAL_DATE_COLUMN) or '').strip()
+                first_date, second_date = calculate_download_dates(deal_date)
+                rows.append((website_url, deal_date, first_date or '', second_date or '',
+                             sanitize_folder_name(website_url)))
+        return rows
+    
+    df = read_csv(csv_file, [WEBSITE_URL_COLUMN, DEAL_DATE_COLUMN], io_backend)
+    
+    # Compute download dates and folder names for all rows at once
+    urls = df[WEBSITE_URL_COLUMN].fillna('').astype(str).str.strip()
+    deal_dates = df[DEAL_DATE_COLUMN].fillna('').astype(str).str.strip()
+    first_dates, second_dates = calculate_download_date_columns(deal_dates)
+    sanitized_names = urls.map({url: sanitize_folder_name(url) for url in urls.unique()})
+    return list(zip(urls, deal_dates, first_dates.fillna(''), second_dates.fillna(''), sanitized_names))
+
+
+def process_csv(csv_file, output_base_dir, state_file_path, concurrency=DEFAULT_CONCURRENCY,
+                io_backend=DEFAULT_IO_BACKEND, persistent_workers=False, cdx_check=True,
+                per_host=DEFAULT_PER_HOST_CONCURRENCY):
     """
     Process the CSV file and download websites for each row.
+    Downloads are run concurrently with asyncio, at most `concurrency` at a time,
+    optionally on persistent Ruby workers instead of one process per download.
+    With `cdx_check`, sites without any Wayback snapshot are skipped up front.
+    At most `per_host` downloads of the same site run at once.
     """
     logging.info(f"Processing CSV file: {csv_file}")
     
     # Always load existing state (resume mode is default)
-    state = load_state(state_file_path)
+    try:
+        store = StateStore(state_file_path)
+    except sqlite3.Error as e:
+        logging.error(f"Error: Could not open state database {state_file_path}: {e}")
+        return False
     
     try:
-        # Read CSV file with semicolon delimiter
-        df = pd.read_csv(csv_file, sep=';')
+        # Check if CSV has the expected columns before loading it
+        header = read_csv_header(csv_file)
+        if not header:
+            logging.error(f"Error: CSV file '{csv_file}' is empty")
+            return False
         
-        # Check if CSV has the expected columns
         required_columns = [WEBSITE_URL_COLUMN, DEAL_DATE_COLUMN]
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in required_columns if col not in header]
         
         if missing_columns:
             logging.error(f"Error: CSV file is missing required columns: {missing_columns}")
             logging.error(f"Expected columns: {required_columns}")
-            logging.error(f"Found columns: {list(df.columns)}")
+            logging.error(f"Found columns: {header}")
             return False
         
-        logging.info(f"Found {len(df)} websites to process")
+        # Read CSV file with semicolon delimiter
+        rows = read_download_rows(csv_file, io_backend)
         
-        # Show resume statistics if state exists
-        if state:
-            completed, total = get_resume_stats(state, df)
-            logging.info(f"Resume statistics: {completed}/{total} downloads already completed")
-            logging.info(f"Remaining: {total - completed} downloads")
-        else:
-            logging.info(f"Starting fresh - no previous state found")
+        logging.info(f"Found {len(rows)} websites to process")
         
-        # Process each row
-        for row_num, (index, row) in enumerate(df.iterrows(), 1):
-            website_url = str(row[WEBSITE_URL_COLUMN]).strip()
-            deal_date = str(row[DEAL_DATE_COLUMN]).strip()
-            
-            # Calculate download dates
-            first_date, second_date = calculate_download_dates(deal_date)
-            if first_date is None or second_date is None:
-                logging.warning(f"Skipping row {row_num} - invalid deal date: {deal_date}")
+        # Build the list of downloads by processing each row, dropping
+        # duplicate (url, date) pairs
+        tasks = {}
+        scheduled = 0
+        folder_prefix = os.path.join(output_base_dir, '')
+        for row_num, (website_url, deal_date, first_date, second_date, sanitized_name) in enumerate(rows, 1):
+            if not website_url:
+                logging.warning("Skipping row %d - missing URL", row_num)
                 continue
             
-            logging.info(f"\n--- Processing row {row_num}/{len(df)} ---")
-            logging.info(f"Website: {website_url}")
-            logging.info(f"Deal date: {deal_date}")
-            logging.info(f"First date ({MONTHS_BEFORE_DEAL} months before): {first_date}")
-            logging.info(f"Second date ({MONTHS_AFTER_DEAL} months after): {second_date}")
-            
-            # Create sanitized folder name
-            sanitized_name = sanitize_folder_name(website_url)
-            
-            # Create output folders
-            first_date_folder = os.path.join(output_base_dir, f"{sanitized_name}_up_to_{first_date}")
-            second_date_folder = os.path.join(output_base_dir, f"{sanitized_name}_up_to_{second_date}")
-            
-            # Download for first date
-            run_wayback_downloader(website_url, first_date, first_date_folder, state, state_file_path)
+            if not first_date or not second_date:
+                logging.warning("Skipping row %d - invalid deal date: %s", row_num, deal_date)
+                continue
             
-            # Download for second date
-            run_wayback_downloader(website_url, second_date, second_date_folder, state, state_file_path)
+            # Per-row details only with --verbose; formatted lazily by logging
+            logging.debug(
+                "\n--- Processing row %d/%d ---\n"
+                "Website: %s\n"
+                "Deal date: %s\n"
+                "First date (%d months before): %s\n"
+                "Second date (%d months after): %s",
+                row_num, len(rows), website_url, deal_date,
+                MONTHS_BEFORE_DEAL, first_date, MONTHS_AFTER_DEAL, second_date
+            )
             
-        logging.info(f"\n Finished processing all {len(df)} websites")
+            # Queue one download per date
+            for date in (first_date, second_date):
+                scheduled += 1
+                if (website_url, date) in tasks:
+                    continue
+                
+                folder_name = f"{sanitized_name}_up_to_{date}"
+                key = get_download_key(website_url, date, folder_name)
+                tasks[(website_url, date)] = DownloadTask(
+                    website_url, date, folder_prefix + folder_name, folder_name, key
+                )
         
-        # Final state save
-        save_state(state, state_file_path)
+        if scheduled != len(tasks):
+            logging.info(f"Deduplicated {scheduled} -> {len(tasks)} download tasks")
+        
+        # Skip downloads that are already completed, checking every key
+        # against the store's completed set in a single pass
+        pending = [task for task in tasks.values() if not is_download_completed(store.completed_keys, task.key)]
+        
+        # Show resume statistics if state exists
+        if store.state:
+            total = len(tasks)
+            completed = total - len(pending)
+            logging.info(f"Resume statistics: {completed}/{total} downloads already completed")
+            logging.info(f"Remaining: {len(pending)} downloads")
+        else:
+            logging.info(f"Starting fresh - no previous state found")
+        
+        # Skip downloads the Wayback Machine has nothing for
+        if cdx_check:
+            pending = filter_archived_tasks(pending, concurrency)
+        
+        # Run the downloads concurrently
+        logging.info(f"Starting {len(pending)} downloads with {concurrency} workers")
+        asyncio.run(run_downloads(pending, store, concurrency, persistent_workers, per_host))
+            
+        logging.info(f"\n Finished processing all {len(rows)} websites")
         return True
         
     except FileNotFoundError:
         logging.error(f"Error: CSV file '{csv_file}' not found")
         return False
-    except pd.errors.EmptyDataError:
-        logging.error(f"Error: CSV file '{csv_file}' is empty")
-        return False
     except Exception as e:
         logging.error(f"Error processing CSV file: {e}")
         return False
+    finally:
+        # Final state save
+        store.close()
+
+
+def handle_termination(signum, frame):
+    """
+    Turn SIGTERM into a normal exit so the final state save still runs.
+    """
+    raise SystemExit(128 + signum)
 
 
 def main():
@@ -428,7 +1529,48 @@ def main():
     parser.add_argument(
         "--state-file",
         "-s",
-        help="Path to state file (default: <output_dir>/wayback_scraper_state.json)"
+        help="Path to state file (default: <output_dir>/wayback_scraper_state.json); "
+             "use a .msgpack extension for a compact binary state file "
+             "or .sqlite for a SQLite database"
+    )
+    parser.add_argument(
+        "--io-backend",
+        choices=IO_BACKENDS,
+        default=DEFAULT_IO_BACKEND,
+        help=f"Library used to read the CSV file (default: {DEFAULT_IO_BACKEND})"
+    )
+    parser.add_argument(
+        "--persistent-workers",
+        action="store_true",
+        help="Run downloads on long-lived Ruby workers (wm_worker.rb) instead of "
+             "starting the downloader once per download"
+    )
+    parser.add_argument(
+        "--no-cdx-check",
+        dest="cdx_check",
+        action="store_false",
+        help="Do not check the Wayback CDX API for snapshots before downloading"
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="Also log the details of every CSV row"
+    )
+    parser.add_argument(
+        "--concurrency",
+        "--workers",
+        "-c",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Number of downloads to run in parallel (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=DEFAULT_PER_HOST_CONCURRENCY,
+        help=f"Number of downloads of the same site to run in parallel "
+             f"(default: {DEFAULT_PER_HOST_CONCURRENCY})"
     )
     
     args = parser.parse_args()
@@ -438,15 +1580,29 @@ def main():
         print(f"Error: CSV file '{args.csv_file}' does not exist")
         sys.exit(1)
     
+    if args.concurrency < 1:
+        print(f"Error: --concurrency must be at least 1 (got {args.concurrency})")
+        sys.exit(1)
+    
+    if args.per_host < 1:
+        print(f"Error: --per-host must be at least 1 (got {args.per_host})")
+        sys.exit(1)
+    
     # Create output directory
     output_dir = os.path.abspath(args.output)
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
     # Set state file path
     state_file_path = args.state_file or os.path.join(output_dir, STATE_FILE_NAME)
+    if is_msgpack_state_file(state_file_path) and msgpack is None:
+        print(f"Error: state file '{state_file_path}' needs the msgpack package (pip install msgpack)")
+        sys.exit(1)
     
     # Setup logging
-    logger = setup_logging(output_dir)
+    logger = setup_logging(output_dir, args.verbose)
+    
+    # Save the state on docker stop / kill as well as on Ctrl+C
+    signal.signal(signal.SIGTERM, handle_termination)
     
     logger.info("=" * 50)
     logger.info("Wayback Machine Scraper")
@@ -454,11 +1610,15 @@ def main():
     logger.info(f"Output directory: {output_dir}")
     logger.info(f"State file: {state_file_path}")
     logger.info(f"Time periods: {MONTHS_BEFORE_DEAL} months before, {MONTHS_AFTER_DEAL} months after deal date")
+    logger.info(f"Concurrency: {args.concurrency} parallel downloads, {args.per_host} per site")
     logger.info(f"Resume mode: ALWAYS ON (automatic)")
     logger.info("=" * 50)
     
     # Process the CSV file
-    success = process_csv(args.csv_file, output_dir, state_file_path)
+    success = process_csv(
+        args.csv_file, output_dir, state_file_path, args.concurrency, args.io_backend,
+        args.persistent_workers, args.cdx_check, args.per_host
+    )
     
     if success:
         logger.info(f"\nAll downloads completed. Check the '{output_dir}' directory for results.")
@@ -0,0 +1,45 @@
+#!/usr/bin/env ruby
+# Persistent wayback-machine-downloader worker used by wayback_scraper.py.
+#
+# Loads the downloader once and then runs one download per JSON request
+# read from stdin, so the Ruby interpreter and gems are only booted once
+# per worker instead of once per download.
+#
+# Request (one line):  {"url": "...", "to": "20160330", "directory": "...",
+#                       "only": "/regex/", "concurrency": 2}
+# Output: the downloader's own output, followed by one status line
+#         {"wm_worker_status": 0} on success or
+#         {"wm_worker_status": 1, "error": "..."} on failure.
+# On startup the worker prints {"wm_worker_ready": true}.
+
+require 'json'
+require_relative 'lib/wayback_machine_downloader'
+
+$stdout.sync = true
+$stderr = $stdout
+
+def send_status(message)
+  $stdout.puts(JSON.generate(message))
+end
+
+send_status('wm_worker_ready' => true)
+
+$stdin.each_line do |line|
+  begin
+    request = JSON.parse(line)
+    options = {
+      base_url: request.fetch('url'),
+      to_timestamp: request.fetch('to').to_i,
+      directory: request.fetch('directory'),
+      only_filter: request['only'],
+      threads_count: request.fetch('concurrency', 1).to_i
+    }
+    WaybackMachineDownloader.new(options).download_files
+    send_status('wm_worker_status' => 0)
+  rescue SystemExit => e
+    # The downloader may call exit; keep the worker alive
+    send_status('wm_worker_status' => e.success? ? 0 : 1, 'error' => "exit #{e.status}")
+  rescue StandardError => e
+    send_status('wm_worker_status' => 1, 'error' => "#{e.class}: #{e.message}")
+  end
+end